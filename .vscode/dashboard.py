@@ -1,87 +1,451 @@
+import io
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
-import os  # For file cleanup
+import plotly.graph_objects as go
 
 st.set_page_config(page_title="Insurance Claims Dashboard", layout="wide")
 st.title("Insurance Claims Analysis and Visualization Dashboard")
 
+# Prefer the faster optional Excel engines when installed: calamine (Rust)
+# for reading, xlsxwriter (streaming) for writing; fall back to openpyxl
+try:
+    import python_calamine  # noqa: F401
+    excel_read_engine = 'calamine'
+except ImportError:
+    excel_read_engine = 'openpyxl'
+
+try:
+    import xlsxwriter  # noqa: F401
+    excel_write_engine = 'xlsxwriter'
+except ImportError:
+    excel_write_engine = 'openpyxl'
+
+# pyarrow parses CSVs in parallel; the default single-threaded C engine is
+# the fallback when it isn't installed
+try:
+    import pyarrow  # noqa: F401
+    csv_read_kwargs = {'engine': 'pyarrow', 'dtype_backend': 'numpy_nullable'}
+except ImportError:
+    csv_read_kwargs = {}
+
+# numba fuses the four Total-column calculations into one parallel pass over
+# the amount arrays; without it, enrich falls back to plain NumPy
+try:
+    import numba
+except ImportError:
+    numba = None
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def compute_totals(sub, r1, r2, paid, rp1, rp2, den, rd1, rd2,
+                       out_sub, out_paid, out_den, out_pen):
+        for i in numba.prange(sub.shape[0]):
+            p = round(paid[i] + rp1[i] + rp2[i], 2)
+            d = round((den[i] - r1[i]) + (rd1[i] - r2[i]) + rd2[i], 2)
+            out_sub[i] = round(sub[i] + r1[i] + r2[i], 2)
+            out_paid[i] = p
+            out_den[i] = d
+            out_pen[i] = round(sub[i] - (p + d), 2)
+
+
+# Amount columns coerced to numeric during ingest/enrich (expanded for robustness)
+amount_cols = ['Paid_Amount', 'Resubmission_Paid_Amount_1', 'Resubmission_Paid_Amount2',
+               'Submitted_Amount', 'Resubmitted_Amount_1', 'Resubmitted_Amount2',
+               'Denied_Amount', 'Resubmission_Denied_Amount_Remittance_1', 'Resubmission_Denied_Amount_Remittance_2']
+
+# CSVs above this size are streamed in chunks rather than parsed in one go
+large_csv_bytes = 50 * 1024 * 1024
+csv_chunk_rows = 100_000
+
+
+# Cached parse: keyed on file name + raw bytes so reruns (filter changes,
+# download clicks) reuse the already-parsed DataFrame instead of re-reading;
+# persist="disk" keeps entries across server restarts so a re-upload of the
+# same file after a restart skips the parse as well
+@st.cache_data(show_spinner="Parsing file...", max_entries=4, persist="disk")
+def load_df(name: str, data: bytes) -> pd.DataFrame:
+    buffer = io.BytesIO(data)
+    if name.endswith(".csv"):
+        if len(data) > large_csv_bytes:
+            # Stream large CSVs chunk by chunk, coercing amount columns to
+            # float32 as each chunk arrives: peak memory is bounded by one
+            # chunk plus the already-downcast frame, instead of a full
+            # object/float64 copy of the file (chunksize requires the
+            # default C engine, so no pyarrow kwargs here)
+            chunks = []
+            for chunk in pd.read_csv(buffer, chunksize=csv_chunk_rows):
+                chunk.columns = chunk.columns.str.strip()
+                present = [c for c in amount_cols if c in chunk.columns]
+                if present:
+                    chunk[present] = pd.concat({c: pd.to_numeric(chunk[c], errors='coerce') for c in present}, axis=1).fillna(0.0).astype('float32')
+                chunks.append(chunk)
+            return pd.concat(chunks, ignore_index=True)
+        return pd.read_csv(buffer, **csv_read_kwargs)
+    return pd.read_excel(buffer, engine=excel_read_engine)
+
+
+# Month ordering shared by the monthly table and heatmap
+month_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+# Cached cleaning/derivation: type coercion, date parsing, and the Total
+# columns only recompute when the parsed frame itself changes, not per rerun;
+# persisted to disk so warm restarts skip the whole pipeline
+@st.cache_data(persist="disk")
+def enrich(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+
+    # Coerce each column directly rather than through DataFrame.apply;
+    # float32 halves the memory the filters and sums have to touch
+    df[amount_cols] = pd.concat({c: pd.to_numeric(df[c], errors='coerce') for c in amount_cols}, axis=1).fillna(0.0).astype('float32')
+
+    # Convert 'Remittance_Date' column to datetime
+    df['Remittance_Date'] = pd.to_datetime(df['Remittance_Date'], errors='coerce')
+    df = df.dropna(subset=['Remittance_Date'])
+
+    # Extract year, month, and quarter; month and payer become categoricals
+    # so groupbys hash small integer codes instead of Python strings
+    # int16/int8 are plenty for years and quarters and shrink groupby keys
+    df['Remittance_Year'] = df['Remittance_Date'].dt.year.astype('int16')
+    # dt.month is a vectorized int extraction; strftime('%b') would format
+    # each row through a Python-level string path
+    df['Remittance_Month'] = pd.Categorical.from_codes(df['Remittance_Date'].dt.month.to_numpy() - 1, categories=month_order, ordered=True)
+    df['Quarter'] = df['Remittance_Date'].dt.quarter.astype('int8')
+    df['Payer_Name'] = df['Payer_Name'].astype('category')
+
+    # Simplified calculations (adjust logic as needed for accuracy), done on
+    # raw NumPy views so no intermediate Series get allocated; the inputs are
+    # already float32 and the results stay float32
+    sub = df['Submitted_Amount'].to_numpy()
+    r1 = df['Resubmitted_Amount_1'].to_numpy()
+    r2 = df['Resubmitted_Amount2'].to_numpy()
+    if numba is not None:
+        # single fused parallel pass: each row is read and written exactly once
+        total_sub, total_paid, total_denied, total_pending = (np.empty_like(sub) for _ in range(4))
+        compute_totals(sub, r1, r2,
+                       df['Paid_Amount'].to_numpy(), df['Resubmission_Paid_Amount_1'].to_numpy(), df['Resubmission_Paid_Amount2'].to_numpy(),
+                       df['Denied_Amount'].to_numpy(), df['Resubmission_Denied_Amount_Remittance_1'].to_numpy(), df['Resubmission_Denied_Amount_Remittance_2'].to_numpy(),
+                       total_sub, total_paid, total_denied, total_pending)
+    else:
+        total_sub = np.round(sub + r1 + r2, 2)
+        total_paid = np.round(df['Paid_Amount'].to_numpy() + df['Resubmission_Paid_Amount_1'].to_numpy() + df['Resubmission_Paid_Amount2'].to_numpy(), 2)
+        total_denied = np.round((df['Denied_Amount'].to_numpy() - r1) + (df['Resubmission_Denied_Amount_Remittance_1'].to_numpy() - r2) + df['Resubmission_Denied_Amount_Remittance_2'].to_numpy(), 2)
+        total_pending = np.round(sub - (total_paid + total_denied), 2)
+    df['Total Submitted Amount'] = total_sub
+    df['Total Paid Amount'] = total_paid
+    df['Total Denied Amount'] = total_denied
+    df['Total Pending Amount'] = total_pending
+
+    return df
+
+
+# Cached filtering and aggregations: keyed on the frame plus the selected
+# years/insurers (as tuples for hashability), so repeat interactions with
+# the same filters skip the boolean mask and all the groupby passes
+@st.cache_data
+def filter_df(df: pd.DataFrame, years: tuple, insurers: tuple) -> pd.DataFrame:
+    return df[
+        (df['Remittance_Year'].isin(years)) &
+        (df['Payer_Name'].isin(insurers))
+    ]
+
+
+# One fused pass over the filtered frame: every chart/table aggregate is a
+# further reduction of this small (year, payer, month, quarter) frame, so the
+# large frame is traversed once instead of ~10 times.
+# Payer_Name and Remittance_Month are categoricals, so every groupby and
+# pivot_table below must pass observed=True — otherwise pandas materializes
+# the full Cartesian product of categories, including filtered-out payers.
+total_cols = ['Total Submitted Amount', 'Total Paid Amount', 'Total Denied Amount', 'Total Pending Amount']
+
+
+@st.cache_data
+def fuse_aggregates(fdf: pd.DataFrame) -> pd.DataFrame:
+    return fdf.groupby(['Remittance_Year', 'Payer_Name', 'Remittance_Month', 'Quarter'], observed=True)[total_cols].sum().reset_index()
+
+
+@st.cache_data
+def paid_per_month_table(agg: pd.DataFrame) -> pd.DataFrame:
+    # pivot_table goes straight to wide form instead of groupby + unstack;
+    # the ordered month categorical already yields Jan..Dec columns
+    grouped = agg.pivot_table(values='Total Paid Amount', index=['Remittance_Year', 'Payer_Name'], columns='Remittance_Month', aggfunc='sum', fill_value=0, observed=True)
+    return grouped.reset_index().sort_values(by='Remittance_Year')
+
+
+@st.cache_data
+def year_payer_summary(agg: pd.DataFrame) -> pd.DataFrame:
+    summary = agg.groupby(['Remittance_Year', 'Payer_Name'], observed=True)[total_cols].sum()
+    summary.columns = ['Total_Submitted', 'Total_Paid', 'Total_Denied', 'Total_Pending']
+    return summary.reset_index().sort_values(by='Remittance_Year')
+
+
+@st.cache_data
+def paid_by_year_quarter(agg: pd.DataFrame) -> pd.DataFrame:
+    return agg.groupby(['Remittance_Year', 'Quarter'], observed=True)['Total Paid Amount'].sum().reset_index()
+
+
+@st.cache_data
+def paid_by_payer(agg: pd.DataFrame) -> pd.DataFrame:
+    return agg.groupby('Payer_Name', observed=True)['Total Paid Amount'].sum().reset_index()
+
+
+@st.cache_data
+def submitted_vs_paid_by_payer(agg: pd.DataFrame) -> pd.DataFrame:
+    scatter = agg.groupby('Payer_Name', observed=True)[['Total Submitted Amount', 'Total Paid Amount']].sum()
+    scatter.columns = ['Total_Submitted', 'Total_Paid']
+    return scatter.reset_index()
+
+
+@st.cache_data
+def monthly_paid_trend(agg: pd.DataFrame) -> pd.DataFrame:
+    trend = agg.groupby(['Remittance_Year', 'Remittance_Month'], observed=True)['Total Paid Amount'].sum().reset_index()
+    trend['Month-Year'] = trend['Remittance_Month'].astype(str) + '-' + trend['Remittance_Year'].astype(str)
+    return trend
+
+
+@st.cache_data
+def paid_denied_by_payer(agg: pd.DataFrame) -> pd.DataFrame:
+    pie = agg.groupby('Payer_Name', observed=True)[['Total Paid Amount', 'Total Denied Amount']].sum()
+    pie.columns = ['Total_Paid', 'Total_Denied']
+    return pie.reset_index()
+
+
+@st.cache_data
+def monthly_paid_heatmap(agg: pd.DataFrame) -> pd.DataFrame:
+    return agg.pivot_table(values='Total Paid Amount', index=['Remittance_Year', 'Payer_Name'], columns='Remittance_Month', aggfunc='sum', fill_value=0, observed=True)
+
+
+# Sidebar option lists computed once per frame; Payer_Name is categorical so
+# its categories are already materialized — no O(N) unique scan per rerun
+@st.cache_data
+def get_options(df: pd.DataFrame) -> tuple:
+    return (("ALL",) + tuple(sorted(df['Remittance_Year'].unique())),
+            ("ALL",) + tuple(df['Payer_Name'].cat.categories))
+
+
+# Row-level distribution charts are pre-binned server-side: the browser gets
+# bin counts / quartiles instead of a JSON copy of every filtered row
+@st.cache_data
+def paid_histogram(fdf: pd.DataFrame, bins: int = 50) -> pd.DataFrame:
+    counts, edges = np.histogram(fdf['Total Paid Amount'].to_numpy(), bins=bins)
+    return pd.DataFrame({'Paid Amount ($)': (edges[:-1] + edges[1:]) / 2, 'Claims': counts})
+
+
+@st.cache_data
+def paid_histogram_by_quarter(fdf: pd.DataFrame, bins: int = 30) -> pd.DataFrame:
+    frames = []
+    for quarter, group in fdf.groupby('Quarter', observed=True):
+        counts, edges = np.histogram(group['Total Paid Amount'].to_numpy(), bins=bins)
+        frames.append(pd.DataFrame({'Paid Amount ($)': (edges[:-1] + edges[1:]) / 2, 'Claims': counts, 'Quarter': quarter}))
+    return pd.concat(frames, ignore_index=True)
+
+
+@st.cache_data
+def paid_box_stats(fdf: pd.DataFrame) -> pd.DataFrame:
+    stats = fdf.groupby('Payer_Name', observed=True)['Total Paid Amount'].quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ['q1', 'median', 'q3']
+    iqr = stats['q3'] - stats['q1']
+    stats['lowerfence'] = stats['q1'] - 1.5 * iqr
+    stats['upperfence'] = stats['q3'] + 1.5 * iqr
+    return stats.reset_index()
+
+
+# Report built in a BytesIO buffer (no temp file on disk, safe under
+# concurrent sessions) and cached so the workbook only rebuilds when the
+# filtered contents change
+@st.cache_data
+def build_report(grouped_paid: pd.DataFrame, summary_table: pd.DataFrame, fdf: pd.DataFrame) -> bytes:
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine=excel_write_engine) as writer:
+        grouped_paid.to_excel(writer, sheet_name="Paid Claims Per Month", index=False)
+        summary_table.to_excel(writer, sheet_name="Summary", index=False)
+        fdf.to_excel(writer, sheet_name="All Claims Raw (Filtered)", index=False)
+    return buf.getvalue()
+
+
+@st.cache_data
+def totals_by_year(agg: pd.DataFrame) -> pd.DataFrame:
+    stacked = agg.groupby('Remittance_Year', observed=True)[total_cols].sum()
+    stacked.columns = ['Total_Submitted', 'Total_Paid', 'Total_Denied', 'Total_Pending']
+    return stacked.reset_index()
+
+
+# Charts and the Excel export render as independent fragments, so a rerun
+# originating in one (the download button, say) leaves the other untouched
+@st.fragment
+def render_charts(filtered_df: pd.DataFrame, agg_df: pd.DataFrame):
+    # Charts Section
+    st.subheader("Data Visualizations (Filtered Data)")
+    if filtered_df.empty:
+        st.warning("No data available for the selected filters. Please adjust your selections.")
+        return
+
+    # Existing/Enhanced Charts
+    st.markdown("### Trends and Comparisons")
+
+    # Enhanced Bar Chart: Total Paid Amount per Year (added color by quarter for more insight)
+    yearly_paid = paid_by_year_quarter(agg_df)
+    bar_fig = px.bar(yearly_paid, x='Remittance_Year', y='Total Paid Amount', color='Quarter',
+                     title="Yearly Paid Amount by Quarter", labels={'Total Paid Amount': "Total Paid ($)"},
+                     color_discrete_sequence=px.colors.qualitative.Set1)
+    st.plotly_chart(bar_fig)
+
+    # Enhanced Bar Chart: Paid Amount by Insurance Provider (horizontal for readability)
+    insurance_paid = paid_by_payer(agg_df)
+    bar_insurance = px.bar(insurance_paid, x='Total Paid Amount', y='Payer_Name', orientation='h',
+                           title="Paid Amount by Insurance Provider",
+                           labels={'Total Paid Amount': "Total Paid ($)"}, color_discrete_sequence=px.colors.qualitative.Set2)
+    st.plotly_chart(bar_insurance)
+
+    # Histogram: Distribution of Paid Amounts (binned server-side)
+    hist_df = paid_histogram(filtered_df)
+    hist_fig = px.bar(hist_df, x='Paid Amount ($)', y='Claims',
+                      title="Distribution of Paid Amounts",
+                      color_discrete_sequence=['#1f77b4'])
+    st.plotly_chart(hist_fig)
+
+    # Enhanced Scatter Chart: Paid vs. Submitted by Insurance (added trendline)
+    scatter_data = submitted_vs_paid_by_payer(agg_df)
+    scatter_fig = px.scatter(scatter_data, x='Total_Submitted', y='Total_Paid', color='Payer_Name',
+                             size='Total_Paid', title="Insurance Performance: Submitted vs. Paid Amounts",
+                             labels={'Total_Submitted': 'Total Submitted ($)', 'Total_Paid': 'Total Paid ($)'},
+                             trendline="ols", render_mode='webgl')
+    st.plotly_chart(scatter_fig)
+
+    st.markdown("### Time-Series and Trends")
+
+    # Line Chart: Paid Amount Trends Over Time
+    time_trend = monthly_paid_trend(agg_df)
+    line_fig = px.line(time_trend, x='Month-Year', y='Total Paid Amount',
+                       title="Monthly Paid Amount Trends", labels={'Total Paid Amount': "Total Paid ($)"},
+                       color_discrete_sequence=['#ff7f0e'])
+    st.plotly_chart(line_fig)
+
+    # Area Chart: Cumulative Paid Amounts by Insurance
+    area_data = paid_by_payer(agg_df).sort_values('Total Paid Amount', ascending=False)
+    area_fig = px.area(area_data, x='Payer_Name', y='Total Paid Amount',
+                       title="Cumulative Paid Amounts by Insurance Provider",
+                       labels={'Total Paid Amount': "Total Paid ($)"}, color_discrete_sequence=px.colors.qualitative.Pastel)
+    st.plotly_chart(area_fig)
+
+    st.markdown("### Proportions and Distributions")
+
+    # Pie Chart: Paid vs. Denied Proportions by Insurance
+    pie_data = paid_denied_by_payer(agg_df)
+    pie_data_melted = pie_data.melt(id_vars='Payer_Name', value_vars=['Total_Paid', 'Total_Denied'],
+                                     var_name='Status', value_name='Amount')
+    pie_fig = px.pie(pie_data_melted, values='Amount', names='Status', color='Status',
+                     title="Paid vs. Denied Amounts by Insurance Provider",
+                     labels={'Amount': 'Amount ($)'}, color_discrete_map={'Total_Paid': '00F7FF', 'Total_Denied': 'red'})
+    st.plotly_chart(pie_fig)
+
+    # Box Plot: Paid Amount Distribution by Insurance (quartiles
+    # computed server-side; only 5 numbers per payer reach the browser)
+    box_stats = paid_box_stats(filtered_df)
+    box_fig = go.Figure(go.Box(
+        x=box_stats['Payer_Name'], q1=box_stats['q1'], median=box_stats['median'],
+        q3=box_stats['q3'], lowerfence=box_stats['lowerfence'], upperfence=box_stats['upperfence']
+    ))
+    box_fig.update_layout(title="Paid Amount Distribution by Insurance Provider",
+                          yaxis_title="Paid Amount ($)")
+    st.plotly_chart(box_fig)
+
+    st.markdown("### Advanced Insights")
+
+    # Heatmap: Monthly Paid Amounts by Year and Insurance
+    heatmap_pivot = monthly_paid_heatmap(agg_df)
+    heatmap_fig = px.imshow(heatmap_pivot, text_auto=True, aspect="auto",
+                            title="Heatmap of Monthly Paid Amounts by Year and Insurance",
+                            labels=dict(x="Month", y="Year & Insurance", color="Paid Amount ($)"))
+    st.plotly_chart(heatmap_fig)
+
+    # Scatter Plot: Paid vs. Denied by Insurance
+    scatter_denied = paid_denied_by_payer(agg_df)
+    scatter_denied_fig = px.scatter(scatter_denied, x='Total_Denied', y='Total_Paid', color='Payer_Name',
+                                    size='Total_Paid', title="Paid vs. Denied Amounts by Insurance",
+                                    labels={'Total_Denied': 'Total Denied ($)', 'Total_Paid': 'Total Paid ($)'},
+                                    render_mode='webgl')
+    st.plotly_chart(scatter_denied_fig)
+
+    # Stacked Bar Chart: Multi-Metric Breakdown by Year
+    stacked_data = totals_by_year(agg_df)
+    stacked_fig = px.bar(stacked_data, x='Remittance_Year', y=['Total_Submitted', 'Total_Paid', 'Total_Denied', 'Total_Pending'],
+                         title="Submitted, Paid, Denied, and Pending Amounts by Year",
+                         labels={'value': 'Amount ($)', 'variable': 'Metric'}, barmode='stack')
+    st.plotly_chart(stacked_fig)
+
+    # Faceted Histogram: Paid Amounts by Quarter (binned server-side)
+    facet_hist_df = paid_histogram_by_quarter(filtered_df)
+    facet_hist_fig = px.bar(facet_hist_df, x='Paid Amount ($)', y='Claims', facet_col='Quarter',
+                            title="Distribution of Paid Amounts by Quarter")
+    st.plotly_chart(facet_hist_fig)
+
+
+@st.fragment
+def render_export(grouped_paid: pd.DataFrame, summary_table: pd.DataFrame, filtered_df: pd.DataFrame):
+    # Export to Excel (filtered data, multiple sheets), built in memory
+    report_bytes = build_report(grouped_paid, summary_table, filtered_df)
+
+    # Download button for the Excel file
+    st.download_button("Download Insurance Claims Report (Filtered)", report_bytes,
+                       file_name="Insurance_Claims_Report.xlsx",
+                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+
 # File uploader with size warning
 uploaded_file = st.file_uploader("Upload Excel/CSV File (Max 50MB recommended)", type=["csv", "xls", "xlsx", "xlsm"])
 
 if uploaded_file:
     try:
-        # Load data
-        if uploaded_file.name.endswith(".csv"):
-            df = pd.read_csv(uploaded_file)
-        else:
-            df = pd.read_excel(uploaded_file, engine='openpyxl')
-
-        # Basic validation: Check for required columns
-        required_cols = ['Remittance_Date', 'Payer_Name', 'Paid_Amount']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            st.error(f"Missing required columns: {missing_cols}. Please check your file.")
-            st.stop()
-
-        # Data cleaning
-        df.columns = df.columns.str.strip()
-
-        # Convert amount columns to numeric (expanded for robustness)
-        amount_cols = ['Paid_Amount', 'Resubmission_Paid_Amount_1', 'Resubmission_Paid_Amount2',
-                       'Submitted_Amount', 'Resubmitted_Amount_1', 'Resubmitted_Amount2',
-                       'Denied_Amount', 'Resubmission_Denied_Amount_Remittance_1', 'Resubmission_Denied_Amount_Remittance_2']
-
-        df[amount_cols] = df[amount_cols].apply(pd.to_numeric, errors='coerce').fillna(0)
-
-        # Convert 'Remittance_Date' column to datetime
-        df['Remittance_Date'] = pd.to_datetime(df['Remittance_Date'], errors='coerce')
-        df = df.dropna(subset=['Remittance_Date'])
-
-        # Extract year, month, and quarter
-        df['Remittance_Year'] = df['Remittance_Date'].dt.year
-        df['Remittance_Month'] = df['Remittance_Date'].dt.strftime('%b')
-        df['Quarter'] = df['Remittance_Date'].dt.quarter
-
-        # Simplified calculations (adjust logic as needed for accuracy)
-        df['Total Submitted Amount'] = round(df['Submitted_Amount'] + df['Resubmitted_Amount_1'] + df['Resubmitted_Amount2'], 2)
-        df['Total Paid Amount'] = round(df['Paid_Amount'] + df['Resubmission_Paid_Amount_1'] + df['Resubmission_Paid_Amount2'], 2)
-        df['Total Denied Amount'] = round((df['Denied_Amount'] - df['Resubmitted_Amount_1']) + (df['Resubmission_Denied_Amount_Remittance_1'] - df['Resubmitted_Amount2']) + df['Resubmission_Denied_Amount_Remittance_2'], 2)
-        df['Total Pending Amount'] = round(df['Submitted_Amount'] - (df['Total Paid Amount'] + df['Total Denied Amount']), 2)
+        # Load and enrich only when a different file arrives: the session_state
+        # guard on (name, size) skips even the cache lookup (which hashes the
+        # file bytes) on reruns triggered by unrelated widgets
+        file_key = (uploaded_file.name, uploaded_file.size)
+        if st.session_state.get('df_key') != file_key:
+            # Load data (cached across reruns for identical uploads)
+            df = load_df(uploaded_file.name, uploaded_file.getvalue())
+
+            # Basic validation: Check for required columns
+            required_cols = ['Remittance_Date', 'Payer_Name', 'Paid_Amount']
+            missing_cols = [col for col in required_cols if col not in df.columns]
+            if missing_cols:
+                st.error(f"Missing required columns: {missing_cols}. Please check your file.")
+                st.stop()
+
+            # Data cleaning and derived columns (cached across reruns)
+            st.session_state['df'] = enrich(df)
+            st.session_state['df_key'] = file_key
+
+        df = st.session_state['df']
 
         # Sidebar filters for interactivity
         st.sidebar.header("Filters")
 
-        # Options for years with "ALL" added
-        year_options = ["ALL"] + sorted(df['Remittance_Year'].unique())
+        # Options for years/insurance with "ALL" added (cached per frame)
+        year_options, insurance_options = get_options(df)
         selected_year = st.sidebar.multiselect("Select Year(s)", options=year_options, default=["ALL"])
-
-        # Options for insurance with "ALL" added
-        insurance_options = ["ALL"] + list(df['Payer_Name'].unique())
         selected_insurance = st.sidebar.multiselect("Select Insurance(s)", options=insurance_options, default=["ALL"])
 
         # Determine effective selections: if "ALL" is selected, use all options; otherwise, use selected ones
-        effective_year = df['Remittance_Year'].unique() if "ALL" in selected_year else [y for y in selected_year if y != "ALL"]
-        effective_insurance = df['Payer_Name'].unique() if "ALL" in selected_insurance else [i for i in selected_insurance if i != "ALL"]
+        # (sorted tuples so the cached filter can hash the selections)
+        effective_year = year_options[1:] if "ALL" in selected_year else tuple(sorted(y for y in selected_year if y != "ALL"))
+        effective_insurance = insurance_options[1:] if "ALL" in selected_insurance else tuple(sorted(i for i in selected_insurance if i != "ALL"))
+
+        # Apply filters using the effective selections (cached per selection)
+        filtered_df = filter_df(df, effective_year, effective_insurance)
 
-        # Apply filters using the effective selections
-        filtered_df = df[
-            (df['Remittance_Year'].isin(effective_year)) &
-            (df['Payer_Name'].isin(effective_insurance))
-        ]
+        # Single fused aggregation pass; tables and charts reduce this further
+        agg_df = fuse_aggregates(filtered_df)
 
         # Group by year, insurance provider, and month (filtered)
-        month_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-        grouped_paid = filtered_df.groupby(['Remittance_Year', 'Payer_Name', 'Remittance_Month'])['Total Paid Amount'].sum().unstack(fill_value=0)
-        grouped_paid = grouped_paid.reindex(columns=month_order, fill_value=0).reset_index().sort_values(by='Remittance_Year')
+        grouped_paid = paid_per_month_table(agg_df)
 
         # Additional summary table (new for completeness)
-        summary_table = filtered_df.groupby(['Remittance_Year', 'Payer_Name']).agg(
-            Total_Submitted=('Total Submitted Amount', 'sum'),
-            Total_Paid=('Total Paid Amount', 'sum'),
-            Total_Denied=('Total Denied Amount', 'sum'),
-            Total_Pending=('Total Pending Amount', 'sum')
-        ).reset_index().sort_values(by='Remittance_Year')
+        summary_table = year_payer_summary(agg_df)
 
         # Display Tables
         st.subheader("Paid Amount Per Month (Filtered)")
@@ -89,134 +453,10 @@ if uploaded_file:
         st.subheader("Summary Table: Submitted, Paid, Denied by Year and Insurance (Filtered)")
         st.dataframe(summary_table)
 
-        # Charts Section
-        st.subheader("Data Visualizations (Filtered Data)")
-        if filtered_df.empty:
-            st.warning("No data available for the selected filters. Please adjust your selections.")
-        else:
-            # Existing/Enhanced Charts
-            st.markdown("### Trends and Comparisons")
-
-            # Enhanced Bar Chart: Total Paid Amount per Year (added color by quarter for more insight)
-            yearly_paid = filtered_df.groupby(['Remittance_Year', 'Quarter'])['Total Paid Amount'].sum().reset_index()
-            bar_fig = px.bar(yearly_paid, x='Remittance_Year', y='Total Paid Amount', color='Quarter',
-                             title="Yearly Paid Amount by Quarter", labels={'Total Paid Amount': "Total Paid ($)"},
-                             color_discrete_sequence=px.colors.qualitative.Set1)
-            st.plotly_chart(bar_fig)
-
-            # Enhanced Bar Chart: Paid Amount by Insurance Provider (horizontal for readability)
-            insurance_paid = filtered_df.groupby('Payer_Name')['Total Paid Amount'].sum().reset_index()
-            bar_insurance = px.bar(insurance_paid, x='Total Paid Amount', y='Payer_Name', orientation='h',
-                                   title="Paid Amount by Insurance Provider",
-                                   labels={'Total Paid Amount': "Total Paid ($)"}, color_discrete_sequence=px.colors.qualitative.Set2)
-            st.plotly_chart(bar_insurance)
-
-            # Enhanced Histogram: Distribution of Paid Amounts (added marginal rug plot)
-            hist_fig = px.histogram(filtered_df, x='Total Paid Amount', nbins=50,
-                                    title="Distribution of Paid Amounts", labels={'Total Paid Amount': "Paid Amount ($)"},
-                                    marginal="rug", color_discrete_sequence=['#1f77b4'])
-            st.plotly_chart(hist_fig)
-
-            # Enhanced Scatter Chart: Paid vs. Submitted by Insurance (added trendline)
-            scatter_data = filtered_df.groupby('Payer_Name').agg(
-                Total_Submitted=('Total Submitted Amount', 'sum'),
-                Total_Paid=('Total Paid Amount', 'sum')
-            ).reset_index()
-            scatter_fig = px.scatter(scatter_data, x='Total_Submitted', y='Total_Paid', color='Payer_Name',
-                                     size='Total_Paid', title="Insurance Performance: Submitted vs. Paid Amounts",
-                                     labels={'Total_Submitted': 'Total Submitted ($)', 'Total_Paid': 'Total Paid ($)'},
-                                     trendline="ols")
-            st.plotly_chart(scatter_fig)
-
-
-            st.markdown("### Time-Series and Trends")
-
-            # Line Chart: Paid Amount Trends Over Time
-            time_trend = filtered_df.groupby(['Remittance_Year', 'Remittance_Month'])['Total Paid Amount'].sum().reset_index()
-            time_trend['Month-Year'] = time_trend['Remittance_Month'] + '-' + time_trend['Remittance_Year'].astype(str)
-            line_fig = px.line(time_trend, x='Month-Year', y='Total Paid Amount',
-                               title="Monthly Paid Amount Trends", labels={'Total Paid Amount': "Total Paid ($)"},
-                               color_discrete_sequence=['#ff7f0e'])
-            st.plotly_chart(line_fig)
-
-            # Area Chart: Cumulative Paid Amounts by Insurance
-            area_data = filtered_df.groupby('Payer_Name')['Total Paid Amount'].sum().reset_index().sort_values('Total Paid Amount', ascending=False)
-            area_fig = px.area(area_data, x='Payer_Name', y='Total Paid Amount',
-                               title="Cumulative Paid Amounts by Insurance Provider",
-                               labels={'Total Paid Amount': "Total Paid ($)"}, color_discrete_sequence=px.colors.qualitative.Pastel)
-            st.plotly_chart(area_fig)
-
-            st.markdown("### Proportions and Distributions")
-
-            # Pie Chart: Paid vs. Denied Proportions by Insurance
-            pie_data = filtered_df.groupby('Payer_Name').agg(
-                Total_Paid=('Total Paid Amount', 'sum'),
-                Total_Denied=('Total Denied Amount', 'sum')
-            ).reset_index()
-            pie_data_melted = pie_data.melt(id_vars='Payer_Name', value_vars=['Total_Paid', 'Total_Denied'],
-                                             var_name='Status', value_name='Amount')
-            pie_fig = px.pie(pie_data_melted, values='Amount', names='Status', color='Status',
-                             title="Paid vs. Denied Amounts by Insurance Provider",
-                             labels={'Amount': 'Amount ($)'}, color_discrete_map={'Total_Paid': '00F7FF', 'Total_Denied': 'red'})
-            st.plotly_chart(pie_fig)
-
-            # Box Plot: Paid Amount Distribution by Insurance
-            box_fig = px.box(filtered_df, x='Payer_Name', y='Total Paid Amount',
-                             title="Paid Amount Distribution by Insurance Provider",
-                             labels={'Total Paid Amount': "Paid Amount ($)"}, color='Payer_Name')
-            st.plotly_chart(box_fig)
-
-            st.markdown("### Advanced Insights")
-
-            # Heatmap: Monthly Paid Amounts by Year and Insurance
-            heatmap_data = filtered_df.groupby(['Remittance_Year', 'Remittance_Month', 'Payer_Name'])['Total Paid Amount'].sum().reset_index()
-            heatmap_pivot = heatmap_data.pivot_table(values='Total Paid Amount', index=['Remittance_Year', 'Payer_Name'], columns='Remittance_Month', fill_value=0)
-            heatmap_pivot = heatmap_pivot.reindex(columns=month_order, fill_value=0)
-            heatmap_fig = px.imshow(heatmap_pivot, text_auto=True, aspect="auto",
-                                    title="Heatmap of Monthly Paid Amounts by Year and Insurance",
-                                    labels=dict(x="Month", y="Year & Insurance", color="Paid Amount ($)"))
-            st.plotly_chart(heatmap_fig)
-
-            # Scatter Plot: Paid vs. Denied by Insurance
-            scatter_denied = filtered_df.groupby('Payer_Name').agg(
-                Total_Paid=('Total Paid Amount', 'sum'),
-                Total_Denied=('Total Denied Amount', 'sum')
-            ).reset_index()
-            scatter_denied_fig = px.scatter(scatter_denied, x='Total_Denied', y='Total_Paid', color='Payer_Name',
-                                            size='Total_Paid', title="Paid vs. Denied Amounts by Insurance",
-                                            labels={'Total_Denied': 'Total Denied ($)', 'Total_Paid': 'Total Paid ($)'})
-            st.plotly_chart(scatter_denied_fig)
-
-            # Stacked Bar Chart: Multi-Metric Breakdown by Year
-            stacked_data = filtered_df.groupby('Remittance_Year').agg(
-                Total_Submitted=('Total Submitted Amount', 'sum'),
-                Total_Paid=('Total Paid Amount', 'sum'),
-                Total_Denied=('Total Denied Amount', 'sum'),
-                Total_Pending=('Total Pending Amount', 'sum')
-            ).reset_index()
-            stacked_fig = px.bar(stacked_data, x='Remittance_Year', y=['Total_Submitted', 'Total_Paid', 'Total_Denied', 'Total_Pending'],
-                                 title="Submitted, Paid, Denied, and Pending Amounts by Year",
-                                 labels={'value': 'Amount ($)', 'variable': 'Metric'}, barmode='stack')
-            st.plotly_chart(stacked_fig)
-
-            # Faceted Histogram: Paid Amounts by Quarter
-            facet_hist_fig = px.histogram(filtered_df, x='Total Paid Amount', facet_col='Quarter', nbins=30,
-                                          title="Distribution of Paid Amounts by Quarter",
-                                          labels={'Total Paid Amount': "Paid Amount ($)"})
-            st.plotly_chart(facet_hist_fig)
-
-        # Export to Excel (filtered data, multiple sheets)
-        output_file = "Insurance_Claims_Report.xlsx"
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-            grouped_paid.to_excel(writer, sheet_name="Paid Claims Per Month", index=False)
-            summary_table.to_excel(writer, sheet_name="Summary", index=False)
-            filtered_df.to_excel(writer, sheet_name="All Claims Raw (Filtered)", index=False)
-
-        # Download button for the Excel file
-        with open(output_file, "rb") as file:
-            st.download_button("Download Insurance Claims Report (Filtered)", file, file_name="Insurance_Claims_Report.xlsx")
-        # Cleanup
-        os.remove(output_file)
+        # Charts and export live in separate fragments: a rerun triggered
+        # inside one (e.g. the download button) doesn't re-render the other
+        render_charts(filtered_df, agg_df)
+        render_export(grouped_paid, summary_table, filtered_df)
 
     except Exception as e:
         st.error(f"Error processing file: {e}. Please check your data format and try again.")